@@ -0,0 +1,93 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from users.models import User
+
+
+class TokenCache:
+    """LRU-кэш токенов с пользователями и ограниченным временем жизни.
+
+    По умолчанию хранится в памяти процесса: запись, сброшенная в одном
+    воркере, в остальных живёт до истечения TOKEN_CACHE_TTL. При
+    TOKEN_CACHE_SHARED используется общий кэш Django и сброс виден сразу
+    всем воркерам.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        if settings.TOKEN_CACHE_SHARED:
+            return cache.get(f'auth_token:{key}')
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, expires = entry
+            if time.monotonic() >= expires:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def set(self, key, token):
+        if settings.TOKEN_CACHE_SHARED:
+            cache.set(f'auth_token:{key}', token, settings.TOKEN_CACHE_TTL)
+            return
+        with self._lock:
+            self._entries[key] = (token, time.monotonic() + settings.TOKEN_CACHE_TTL)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.TOKEN_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        if settings.TOKEN_CACHE_SHARED:
+            cache.delete_many([f'auth_token:{key}' for key in keys])
+            return
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к базе для недавно виденных токенов."""
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, token)
+        elif not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        # Копия, чтобы запросы не делили один объект пользователя.
+        return copy.copy(token.user), token
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_saved(instance, created, update_fields, **kwargs):
+    # update_last_login при входе меняет только last_login, который из
+    # кэшированного пользователя не читается; любое другое поле может.
+    if not created and (update_fields is None or update_fields - {'last_login'}):
+        token_cache.delete(
+            *Token.objects.filter(user=instance).values_list('key', flat=True)
+        )
@@ -0,0 +1,72 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from import_export.signals import post_import
+
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Отсортированный по названию индекс ингредиентов в памяти процесса.
+
+    Сначала отдаёт совпадения по началу названия, затем по подстроке.
+    Перестраивается при изменении ингредиентов в этом процессе и по
+    истечении INGREDIENT_INDEX_TTL для изменений, сделанных в других.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = None
+        self._rows = None
+        self._expires = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+            self._rows = None
+
+    def _load(self):
+        with self._lock:
+            if self._keys is not None and time.monotonic() < self._expires:
+                return self._keys, self._rows
+            entries = sorted(
+                (row['name'].casefold(), row['id'], row)
+                for row in Ingredient.objects.values(
+                    'id', 'name', 'measurement_unit'
+                )
+            )
+            self._keys = [key for key, _, _ in entries]
+            self._rows = [row for _, _, row in entries]
+            self._expires = time.monotonic() + settings.INGREDIENT_INDEX_TTL
+            return self._keys, self._rows
+
+    def search(self, query):
+        keys, rows = self._load()
+        query = query.casefold()
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        return rows[start:end] + [
+            row for key, row in zip(keys, rows)
+            if query in key and not key.startswith(query)
+        ]
+
+
+ingredient_index = IngredientIndex()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_import)
+def ingredients_imported(model, **kwargs):
+    if model is Ingredient:
+        ingredient_index.invalidate()
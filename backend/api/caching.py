@@ -0,0 +1,33 @@
+import time
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from import_export.signals import post_import
+
+from recipes.models import Ingredient, Tag
+
+
+def get_cache_version(prefix):
+    return cache.get_or_set(f'{prefix}:version', time.time_ns, None)
+
+
+def bump_cache_version(prefix):
+    try:
+        cache.incr(f'{prefix}:version')
+    except ValueError:
+        cache.set(f'{prefix}:version', time.time_ns(), None)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def catalog_changed(sender, **kwargs):
+    bump_cache_version(sender._meta.model_name)
+
+
+@receiver(post_import)
+def catalog_imported(model, **kwargs):
+    if model in (Tag, Ingredient):
+        bump_cache_version(model._meta.model_name)
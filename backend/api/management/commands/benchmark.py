@@ -0,0 +1,345 @@
+import csv
+import random
+import re
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import (
+    CaptureQueriesContext, setup_test_environment, teardown_test_environment
+)
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.renderers import FastJSONRenderer
+from api.serializers import IdListSerializer, RecipeReadSerializer
+from api.views import RecipeViewset
+from recipes.models import (
+    Tag, Ingredient, Recipe, IngredientInRecipe, FavoriteRecipes, ShoppingCart
+)
+from recipes.signals import objects_bulk_created
+from users.models import User, Subscribe
+
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'dinner'),
+    ('Ужин', '#8775D2', 'supper'),
+)
+
+# (название, метод, url, бюджет запросов)
+# Токен проверяется по кэшу и, кроме первого запроса, в бюджет не входит.
+ENDPOINTS = (
+    ('recipes', 'get', '/api/recipes/?limit=50', 6),
+    ('recipes (tags)', 'get', '/api/recipes/?tags=breakfast&limit=50', 7),
+    ('recipes (favorited)', 'get', '/api/recipes/?is_favorited=1&limit=50', 6),
+    ('recipes (search)', 'get', '/api/recipes/?search=%D1%80%D0%B5%D1%86%D0%B5%D0%BF%D1%82%201&limit=50', 6),
+    ('recipe', 'get', '/api/recipes/{recipe}/', 5),
+    ('cookable', 'get', '/api/recipes/cookable/?ingredients={ingredients}&limit=50', 7),
+    ('feed', 'get', '/api/recipes/feed/?limit=50', 8),
+    ('subscriptions', 'get', '/api/users/subscriptions/?limit=20&recipes_limit=3', 3),
+    ('ingredients', 'get', '/api/ingredients/?name=к', 0),
+    ('download_shopping_cart', 'get', '/api/recipes/download_shopping_cart/', 2),
+    ('shopping_list', 'get', '/api/recipes/shopping_list/', 2),
+    ('favorite (add)', 'post', '/api/recipes/{recipe}/favorite/', 3),
+    ('favorite (remove)', 'delete', '/api/recipes/{recipe}/favorite/', 6),
+    ('shopping_cart (add)', 'post', '/api/recipes/{recipe}/shopping_cart/', 8),
+    ('shopping_cart (remove)', 'delete', '/api/recipes/{recipe}/shopping_cart/', 9),
+    ('subscribe (add)', 'post', '/api/users/{author}/subscribe/', 10),
+    ('subscribe (remove)', 'delete', '/api/users/{author}/subscribe/', 8),
+)
+
+# Таблицы, полный просмотр которых в планах запросов считается ошибкой.
+INDEXED_TABLES = (
+    'recipes_recipe', 'recipes_recipe_tags', 'recipes_ingredientinrecipe',
+    'recipes_favoriterecipes', 'recipes_shoppingcart', 'recipes_feedentry',
+    'recipes_shoppinglistitem', 'users_subscribe',
+)
+
+SEQUENTIAL_SCAN = {
+    'postgresql': ('EXPLAIN {}', re.compile(r'Seq Scan on (\w+)')),
+    'sqlite': ('EXPLAIN QUERY PLAN {}', re.compile(r'^SCAN (\w+)$')),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет тестовую базу синтетическими данными и измеряет число '
+        'запросов, задержку и выделение памяти для эндпоинтов API'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Проверить планы запросов на полный просмотр таблиц'
+        )
+        parser.add_argument(
+            '--ingredients',
+            default=settings.BASE_DIR.parent / 'data' / 'ingredients.csv',
+            help='CSV-файл с ингредиентами'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            context = self.seed(options)
+            failures = self.run(context, options['iterations'], options['explain'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if failures:
+            raise CommandError(
+                'Превышен бюджет запросов: {}'.format(', '.join(failures))
+            )
+
+    def seed(self, options):
+        random.seed(0)
+        with open(options['ingredients'], encoding='utf-8') as file:
+            Ingredient.objects.bulk_create(
+                [Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in csv.reader(file)],
+                ignore_conflicts=True
+            )
+        tags = Tag.objects.bulk_create(
+            [Tag(name=name, color=color, slug=slug)
+             for name, color, slug in TAGS]
+        )
+        password = make_password('benchmark')
+        users = User.objects.bulk_create(
+            [User(
+                username=f'user{i}', email=f'user{i}@example.org',
+                first_name='Имя', last_name='Фамилия', password=password
+            ) for i in range(options['users'])]
+        )
+        recipes = Recipe.objects.bulk_create(
+            [Recipe(
+                author=random.choice(users), name=f'Рецепт {i}',
+                image='recipes/benchmark.png', text='Описание рецепта',
+                cooking_time=random.randint(1, 360)
+            ) for i in range(options['recipes'])]
+        )
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        Recipe.tags.through.objects.bulk_create(
+            [Recipe.tags.through(recipe=recipe, tag=tag)
+             for recipe in recipes
+             for tag in random.sample(tags, random.randint(1, len(tags)))]
+        )
+        IngredientInRecipe.objects.bulk_create(
+            [IngredientInRecipe(
+                recipe=recipe, ingredient_id=ingredient,
+                amount=random.randint(1, 500)
+            ) for recipe in recipes
+              for ingredient in random.sample(ingredients, random.randint(3, 12))],
+            batch_size=5000
+        )
+        user = users[0]
+        subscriptions, favorites, shopping_cart = [], [], []
+        for subscriber in users:
+            scale = 10 if subscriber == user else 1
+            subscriptions += [
+                Subscribe(user=subscriber, author=author)
+                for author in random.sample(users, 5 * scale)
+                if author != subscriber
+            ]
+            favorites += [
+                FavoriteRecipes(user=subscriber, recipe=recipe)
+                for recipe in random.sample(recipes, 10 * scale)
+            ]
+            shopping_cart += [
+                ShoppingCart(user=subscriber, recipe=recipe)
+                for recipe in random.sample(recipes, 3 * scale)
+            ]
+        objects_bulk_created(
+            Subscribe, Subscribe.objects.bulk_create(subscriptions, batch_size=5000)
+        )
+        FavoriteRecipes.objects.bulk_create(favorites, batch_size=5000)
+        objects_bulk_created(
+            ShoppingCart,
+            ShoppingCart.objects.bulk_create(shopping_cart, batch_size=5000)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+        )
+        recipe = Recipe.objects.exclude(favorite__user=user).exclude(
+            shopping_cart__user=user
+        ).first().id
+        return {
+            'client': client,
+            'user': user,
+            'recipe': recipe,
+            'ingredients': ','.join(
+                str(id) for id in IngredientInRecipe.objects
+                .filter(recipe=recipe).values_list('ingredient', flat=True)
+            ),
+            'author': User.objects.exclude(subscribed__user=user)
+            .exclude(id=user.id).first().id,
+        }
+
+    def run(self, context, iterations, explain):
+        client = context.pop('client')
+        self.measure_serialization(context.pop('user'), iterations)
+        endpoints = [
+            (name, getattr(client, method), url.format(**context), budget)
+            for name, method, url, budget in ENDPOINTS
+        ]
+        timings = {name: [] for name, *_ in endpoints}
+        queries = {}
+        statements = {}
+        allocations = {}
+        for _ in range(iterations):
+            for name, request, url, budget in endpoints:
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = request(url)
+                    timings[name].append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    raise CommandError(
+                        f'{name}: {response.status_code} {response.content[:200]}'
+                    )
+                queries[name] = len(captured)
+                statements[name] = [query['sql'] for query in captured]
+        for name, request, url, budget in endpoints:
+            tracemalloc.start()
+            request(url)
+            allocations[name] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        failures = []
+        self.stdout.write(
+            f'{"endpoint":<26}{"queries":>8}{"budget":>8}'
+            f'{"p50, ms":>10}{"p95, ms":>10}{"peak, KiB":>11}'
+        )
+        for name, request, url, budget in endpoints:
+            samples = sorted(timings[name])
+            p50 = statistics.median(samples) * 1000
+            p95 = samples[max(0, round(len(samples) * 0.95) - 1)] * 1000
+            line = (
+                f'{name:<26}{queries[name]:>8}{budget:>8}'
+                f'{p50:>10.1f}{p95:>10.1f}{allocations[name] / 1024:>11.0f}'
+            )
+            if queries[name] > budget:
+                failures.append(name)
+                line = self.style.ERROR(line)
+            self.stdout.write(line)
+        persistent, fresh = self.measure_connection(
+            client, dict((name, url) for name, _, url, _ in endpoints)['recipe']
+        )
+        self.stdout.write(
+            'recipe, p50: {:.1f} мс с постоянным соединением, {:.1f} мс с новым '
+            'соединением на запрос (CONN_MAX_AGE={})'.format(
+                persistent * 1000, fresh * 1000,
+                connection.settings_dict['CONN_MAX_AGE']
+            )
+        )
+        if explain:
+            for name, method, *_ in ENDPOINTS:
+                if method == 'get' and self.has_sequential_scans(statements[name]):
+                    failures.append(f'{name} (EXPLAIN)')
+        return failures
+
+    def measure_serialization(self, user, iterations, page_size=50):
+        """Сравнивает процессорное время на страницу списка рецептов:
+        поля DRF и JSONRenderer против быстрого пути и FastJSONRenderer."""
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        view = RecipeViewset(request=request, action='list', format_kwarg=None)
+        recipes = list(view.get_queryset()[:page_size])
+        serializer = RecipeReadSerializer(context=view.get_serializer_context())
+        paths = {
+            'DRF': (
+                lambda: [
+                    super(RecipeReadSerializer, serializer).to_representation(recipe)
+                    for recipe in recipes
+                ],
+                JSONRenderer()
+            ),
+            'fast': (
+                lambda: [serializer.to_representation(recipe) for recipe in recipes],
+                FastJSONRenderer()
+            ),
+        }
+        timings = {}
+        content = {}
+        for name, (serialize, renderer) in paths.items():
+            samples = []
+            for _ in range(iterations):
+                start = time.process_time()
+                data = serialize()
+                middle = time.process_time()
+                content[name] = renderer.render(data)
+                samples.append((middle - start, time.process_time() - middle))
+            timings[name] = [
+                statistics.median(sample) * 1000 for sample in zip(*samples)
+            ]
+        if content['DRF'] != content['fast']:
+            raise CommandError('Быстрая сериализация рецептов расходится с DRF')
+        # Ошибки ListField приходят со словарями с целочисленными ключами.
+        errors = IdListSerializer(data={'ids': ['x', 0]})
+        errors.is_valid()
+        if JSONRenderer().render(errors.errors) != FastJSONRenderer().render(errors.errors):
+            raise CommandError('FastJSONRenderer расходится с JSONRenderer на ошибках')
+        self.stdout.write(
+            f'CPU на страницу из {len(recipes)} рецептов, мс: ' + ', '.join(
+                f'{name} {serialize:.1f} + JSON {render:.1f}'
+                for name, (serialize, render) in timings.items()
+            )
+        )
+
+    def measure_connection(self, client, url, samples=20):
+        """Время запроса с постоянным соединением и с новым соединением,
+        как при CONN_MAX_AGE=0: в тестовом клиенте соединения не
+        закрываются, поэтому на время запроса подставляется новое."""
+        persistent, fresh = [], []
+        original = connections[DEFAULT_DB_ALIAS]
+        for _ in range(samples):
+            start = time.perf_counter()
+            client.get(url)
+            persistent.append(time.perf_counter() - start)
+            wrapper = connections.create_connection(DEFAULT_DB_ALIAS)
+            connections[DEFAULT_DB_ALIAS] = wrapper
+            try:
+                start = time.perf_counter()
+                client.get(url)
+                fresh.append(time.perf_counter() - start)
+            finally:
+                wrapper.close()
+                connections[DEFAULT_DB_ALIAS] = original
+        return statistics.median(persistent), statistics.median(fresh)
+
+    def has_sequential_scans(self, statements):
+        explain, pattern = SEQUENTIAL_SCAN[connection.vendor]
+        found = False
+        for sql in statements:
+            if not sql.startswith('SELECT') or (
+                sql.startswith('SELECT COUNT(*)') and ' WHERE ' not in sql
+            ):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(explain.format(sql))
+                plan = [row[-1] for row in cursor.fetchall()]
+            scans = [
+                line for line in plan
+                if (match := pattern.search(line.strip()))
+                and match.group(1) in INDEXED_TABLES
+            ]
+            if scans:
+                found = True
+                self.stdout.write(self.style.ERROR(sql))
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+        return found
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм: секунды для времени, штуки для запросов.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = {
+    'foodgram_request_duration_seconds': (
+        'Полное время обработки запроса', DURATION_BUCKETS
+    ),
+    'foodgram_request_db_duration_seconds': (
+        'Время выполнения SQL-запросов', DURATION_BUCKETS
+    ),
+    'foodgram_request_serialize_duration_seconds': (
+        'Время рендеринга ответа', DURATION_BUCKETS
+    ),
+    'foodgram_request_db_queries': (
+        'Число SQL-запросов на запрос', QUERY_BUCKETS
+    ),
+}
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """Гистограммы по представлениям в памяти процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+
+    def observe(self, view, method, **values):
+        with self._lock:
+            for name, value in values.items():
+                key = (name, view, method)
+                if key not in self._histograms:
+                    self._histograms[key] = Histogram(HISTOGRAMS[name][1])
+                self._histograms[key].observe(value)
+
+    def export(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            lines = []
+            for metric, (description, _) in HISTOGRAMS.items():
+                lines += [
+                    f'# HELP {metric} {description}',
+                    f'# TYPE {metric} histogram',
+                ]
+                for (name, view, method), histogram in histograms:
+                    if name != metric:
+                        continue
+                    labels = f'view="{view}",method="{method}"'
+                    total = 0
+                    for bucket, count in zip(
+                        histogram.buckets + ('+Inf',), histogram.counts
+                    ):
+                        total += count
+                        lines.append(
+                            f'{metric}_bucket{{{labels},le="{bucket}"}} {total}'
+                        )
+                    lines += [
+                        f'{metric}_sum{{{labels}}} {histogram.sum}',
+                        f'{metric}_count{{{labels}}} {total}',
+                    ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class QueryTimer:
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def duration(self):
+        return sum(duration for _, duration in self.queries)
+
+
+class PerformanceMiddleware:
+    """Замеряет запросы к БД, рендеринг и полное время обработки запроса.
+
+    Добавляет заголовок Server-Timing, пишет в лог медленные запросы
+    вместе с их SQL и копит гистограммы для /api/metrics/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        timer = QueryTimer()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        serialize = getattr(request, '_serialize_duration', 0)
+
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timer.duration * 1000:.1f};desc="{len(timer.queries)} SQL"',
+            f'serialize;dur={serialize * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        registry.observe(
+            view, request.method,
+            foodgram_request_duration_seconds=total,
+            foodgram_request_db_duration_seconds=timer.duration,
+            foodgram_request_serialize_duration_seconds=serialize,
+            foodgram_request_db_queries=len(timer.queries),
+        )
+        if total * 1000 >= settings.SLOW_REQUEST_THRESHOLD:
+            logger.warning(
+                'Медленный запрос %s %s: %.0f мс, SQL: %d запросов за %.0f мс\n%s',
+                request.method, request.get_full_path(), total * 1000,
+                len(timer.queries), timer.duration * 1000,
+                '\n'.join(
+                    f'  {duration * 1000:.1f} мс: {sql}'
+                    for sql, duration in timer.queries
+                )
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        start = time.perf_counter()
+
+        def rendered(response):
+            request._serialize_duration = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
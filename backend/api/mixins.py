@@ -1,13 +1,61 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models.constants import OnConflict
+from django.db.models import prefetch_related_objects
 from django.shortcuts import get_object_or_404
+from django.utils.http import (
+    http_date, parse_etags, parse_http_date_safe, quote_etag, urlencode
+)
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
+from recipes.signals import objects_bulk_created
+from .caching import get_cache_version
+from .serializers import IdListSerializer
+
+
+def insert_ignoring_conflicts(model, field, objs):
+    """Вставляет объекты, пропуская уже существующие, и возвращает только
+    действительно вставленные.
+
+    bulk_create(ignore_conflicts=True) возвращает все переданные объекты,
+    поэтому вставленные строки определяются по INSERT ... ON CONFLICT DO
+    NOTHING RETURNING (PostgreSQL, SQLite 3.35+), а без RETURNING - по
+    строкам, найденным перед вставкой в той же транзакции.
+    """
+    if not objs:
+        return []
+    column = model._meta.get_field(field)
+    if connection.features.can_return_rows_from_bulk_insert:
+        rows = model.objects._insert(
+            objs,
+            [f for f in model._meta.concrete_fields if not f.primary_key],
+            returning_fields=[column],
+            on_conflict=OnConflict.IGNORE,
+        )
+        # Для одного объекта с конфликтом Django возвращает [None].
+        inserted = {row[0] for row in rows if row}
+    else:
+        before = model.objects.filter(
+            user=objs[0].user_id,
+            **{f'{field}__in': [getattr(obj, column.attname) for obj in objs]}
+        )
+        skipped = set(before.values_list(field, flat=True))
+        model.objects.bulk_create(objs, ignore_conflicts=True)
+        inserted = {getattr(obj, column.attname) for obj in objs} - skipped
+    return [obj for obj in objs if getattr(obj, column.attname) in inserted]
+
+
 class CreateDeleteMixin:
     action = None
     request = None
     queryset = None 
 
-    def create_delete(self, serializer, model, field):
+    def create_delete(self, serializer, model, field, exists_error, missing_error):
         obj = get_object_or_404(self.queryset, id=self.kwargs['pk'])
         context = {
             'request': self.request,
@@ -21,7 +69,150 @@ class CreateDeleteMixin:
         if self.request.method == 'POST':
             serializer = serializer(obj, data=self.request.data, context=context)
             serializer.is_valid(raise_exception=True)
-            model.objects.create(**data)
+            # Существующая связь определяется по ON CONFLICT DO NOTHING без
+            # транзакции и точки сохранения вокруг IntegrityError.
+            objs = insert_ignoring_conflicts(model, field, [model(**data)])
+            if not objs:
+                raise ValidationError({'errors': exists_error})
+            objects_bulk_created(model, objs)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
-        model.objects.filter(**data).delete()
+        deleted, _ = model.objects.filter(**data).delete()
+        if not deleted:
+            raise ValidationError({'errors': missing_error})
         return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def bulk_create_delete(self, model, field, queryset):
+        serializer = IdListSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        user = self.request.user
+        found = set(queryset.filter(id__in=ids).values_list('id', flat=True))
+        linked = model.objects.filter(user=user, **{f'{field}__in': ids})
+
+        with transaction.atomic():
+            existing = set(linked.values_list(field, flat=True))
+            if self.request.method == 'POST':
+                objs = insert_ignoring_conflicts(
+                    model, field,
+                    [model(user=user, **{f'{field}_id': id})
+                     for id in ids if id in found and id not in existing]
+                )
+                objects_bulk_created(model, objs)
+                # Строки, добавленные параллельным запросом, уже существуют.
+                existing = found - {getattr(obj, f'{field}_id') for obj in objs}
+                statuses = ('created', 'exists')
+            else:
+                linked.delete()
+                statuses = ('missing', 'deleted')
+        results = [
+            {
+                'id': id,
+                'status': (
+                    statuses[id in existing] if id in found else 'not_found'
+                )
+            } for id in ids
+        ]
+        return Response({'results': results})
+
+
+class CacheResponseMixin:
+    cache_prefix = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_key(self, request):
+        version = get_cache_version(self.cache_prefix)
+        params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        return f'{self.cache_prefix}:{version}:{request.path}?{params}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        headers = {
+            'ETag': quote_etag(hashlib.md5(key.encode()).hexdigest()),
+            'Cache-Control': f'public, max-age={settings.CATALOG_CACHE_MAX_AGE}',
+        }
+        if headers['ETag'] in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        data = cache.get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(key, data, settings.CATALOG_CACHE_TIMEOUT)
+        return Response(data, headers=headers)
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 на list и retrieve до сериализации ответа.
+
+    Объекты выбираются без prefetch_related, по ним считается ETag
+    (get_etag_fields) и Last-Modified (get_last_modified), и только если
+    ответ изменился, выполняются связанные запросы и сериализация.
+    """
+
+    def get_prefetch_lookups(self):
+        return ()
+
+    def get_etag_fields(self, obj):
+        raise NotImplementedError
+
+    def get_last_modified(self, obj):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        page = self.paginate_queryset(queryset)
+        objs = list(queryset) if page is None else page
+        fields = [self.get_etag_fields(obj) for obj in objs]
+        if page is not None:
+            fields.append(self.get_paginated_response([]).data)
+        not_modified, headers = self.get_conditional_headers(request, fields)
+        if not_modified:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        prefetch_related_objects(objs, *self.get_prefetch_lookups())
+        data = self.get_serializer(objs, many=True).data
+        if page is None:
+            return Response(data, headers=headers)
+        response = self.get_paginated_response(data)
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = get_object_or_404(
+            queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        self.check_object_permissions(request, obj)
+        not_modified, headers = self.get_conditional_headers(
+            request, self.get_etag_fields(obj), self.get_last_modified(obj)
+        )
+        if not_modified:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        prefetch_related_objects([obj], *self.get_prefetch_lookups())
+        return Response(self.get_serializer(obj).data, headers=headers)
+
+    def get_conditional_headers(self, request, fields, last_modified=None):
+        headers = {
+            'ETag': quote_etag(hashlib.md5(repr(fields).encode()).hexdigest()),
+            'Cache-Control': 'private, no-cache',
+        }
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            return headers['ETag'] in parse_etags(if_none_match), headers
+        if last_modified is None:
+            return False, headers
+        last_modified = int(last_modified.timestamp())
+        headers['Last-Modified'] = http_date(last_modified)
+        if_modified_since = parse_http_date_safe(
+            request.headers.get('If-Modified-Since', '')
+        )
+        return (
+            if_modified_since is not None and last_modified <= if_modified_since
+        ), headers
@@ -1,5 +1,31 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class Pagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    cursor_ordering = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_pagination = None
+        if self.cursor_ordering and (
+            request.query_params.get('pagination') == 'cursor'
+            or CursorPagination.cursor_query_param in request.query_params
+        ):
+            self.cursor_pagination = CursorPagination()
+            self.cursor_pagination.ordering = self.cursor_ordering
+            self.cursor_pagination.page_size_query_param = self.page_size_query_param
+            return self.cursor_pagination.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_pagination:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(Pagination):
+    cursor_ordering = ('-pub_date', '-id')
+
+
+class SubscriptionPagination(Pagination):
+    cursor_ordering = ('id',)
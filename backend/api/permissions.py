@@ -4,4 +4,7 @@ from rest_framework.permissions import BasePermission, SAFE_METHODS
 class IsAuthorOrReadOnly(BasePermission):
 
     def has_object_permission(self, request, view, obj):
-        return (obj.author == request.user or request.method in SAFE_METHODS)
+        return (
+            request.method in SAFE_METHODS
+            or request.user.is_authenticated and obj.author_id == request.user.id
+        )
@@ -0,0 +1,37 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson с тем же побайтным результатом.
+
+    Без orjson, а также для ответов с отступами (indent в Accept или
+    браузерный API) используется стандартный JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.get_indent(
+            accepted_media_type, renderer_context or {}
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        # Даты и время отдаются JSONEncoder из DRF, чтобы формат совпадал;
+        # нестроковые ключи (индексы в ошибках ListField) приводятся к
+        # строкам, как в json; U+2028 и U+2029 экранируются, как в
+        # JSONRenderer. Остальное, что orjson не умеет (например, целые
+        # больше 64 бит), рендерит JSONRenderer.
+        try:
+            content = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        return content.replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -1,12 +1,18 @@
 from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db.models import prefetch_related_objects
+from django.utils.functional import cached_property
 from rest_framework.exceptions import ValidationError
 from rest_framework.serializers import (
-    ModelSerializer, PrimaryKeyRelatedField, SerializerMethodField
+    Field, FloatField, ImageField, IntegerField, ListField, ModelSerializer,
+    PrimaryKeyRelatedField, Serializer, SerializerMethodField
 )
 from djoser.serializers import UserSerializer, UserCreateSerializer
 from drf_extra_fields.fields import Base64ImageField
 
+from recipes import shopping_list
 from recipes.models import Tag, Ingredient, Recipe, IngredientInRecipe
+from recipes.signals import bump_shopping_cart_version
 from users.models import User
 
 
@@ -18,6 +24,8 @@ class CustomUserSerializer(UserSerializer):
         fields = ('email', 'id', 'username', 'first_name', 'last_name', 'is_subscribed')
     
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         user = self.context.get('request').user
         return user.is_authenticated and user.subscriber.filter(author=author).exists()
 
@@ -39,13 +47,13 @@ class SubscriptionSerializer(CustomUserSerializer):
     def validate(self, data):
         user = self.context.get('request').user
         author = self.instance
-        if user.subscriber.filter(author=author).exists():
-            raise ValidationError({'errors': 'Подписка уже оформлена'})
         if user == author:
             raise ValidationError({'errors': 'Нельзя подписаться на себя'})
         return data
 
     def get_recipes(self, author):
+        if hasattr(author, 'limited_recipes'):
+            return RecipeMinifiedSerializer(author.limited_recipes, many=True).data
         queryset = author.recipes.all()
         request = self.context.get('request')
         recipes_limit = request.query_params.get(settings.LIMIT_QUERY_PARAM)
@@ -55,6 +63,8 @@ class SubscriptionSerializer(CustomUserSerializer):
         return serializer.data
 
     def get_recipes_count(self, author):
+        if hasattr(author, 'recipes_count'):
+            return author.recipes_count
         return author.recipes.count()
 
 
@@ -95,28 +105,45 @@ class IngredientInRecipeSerializer(ModelSerializer):
         return internal_value
 
 
+class ImageVariantsField(Field):
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return image_variant_urls(recipe, self.context.get('request'))
+
+
+def absolute_url(url, request):
+    return request.build_absolute_uri(url) if request else url
+
+
+def image_variant_urls(recipe, request, image_url=None):
+    # image_url - уже построенный адрес оригинала, чтобы не считать его
+    # заново для каждого варианта, которого ещё нет.
+    if not recipe.image:
+        return None
+    urls = {}
+    for variant in settings.IMAGE_VARIANTS:
+        path = recipe.image_variants.get(variant)
+        if path:
+            urls[variant] = absolute_url(recipe.image.storage.url(path), request)
+            continue
+        if image_url is None:
+            image_url = absolute_url(recipe.image.url, request)
+        urls[variant] = image_url
+    return urls
+
+
 class RecipeMinifiedSerializer(ModelSerializer):
+    images = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
         read_only_fields = ('name', 'image', 'cooking_time')
 
-    def validate(self, data):
-        action = self.context.get('action')
-        user = self.context.get('request').user
-        recipe = self.instance
-        if (
-            action == 'shopping_cart' and
-            user.shopping_cart.filter(recipe=recipe).exists()
-        ):
-            raise ValidationError({'errors': 'Рецепт уже есть в корзине'})
-        if (
-            action == 'favorite' and
-            user.favorite.filter(recipe=recipe).exists()
-        ):
-            raise ValidationError({'errors': 'Рецепт уже есть в избранном'})
-        return data
-
 
 class RecipeReadSerializer(ModelSerializer):
     tags = TagSerializer(many=True)
@@ -126,29 +153,101 @@ class RecipeReadSerializer(ModelSerializer):
     )
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
+    images = ImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'images', 'text',
+            'cooking_time'
         )
 
+    def to_representation(self, recipe):
+        # Список и карточка рецепта отдаются через этот сериализатор, а
+        # обход полей DRF занимает большую часть времени ответа. Словарь
+        # собирается напрямую из предзагруженных объектов; ключи, порядок
+        # и значения совпадают с ModelSerializer.to_representation
+        # (проверяется командой benchmark).
+        request = self.context.get('request')
+        author = recipe.author
+        image = absolute_url(recipe.image.url, request) if recipe.image else None
+        return {
+            'id': recipe.id,
+            'tags': [
+                {'id': tag.id, 'name': tag.name, 'color': tag.color, 'slug': tag.slug}
+                for tag in recipe.tags.all()
+            ],
+            'author': None if author is None else {
+                'email': author.email,
+                'id': author.id,
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'is_subscribed': self.author_serializer.get_is_subscribed(author),
+            },
+            'ingredients': [
+                {
+                    'id': item.ingredient.id,
+                    'name': item.ingredient.name,
+                    'measurement_unit': item.ingredient.measurement_unit,
+                    'amount': item.amount,
+                }
+                for item in recipe.ingredients_in_recipe.all()
+            ],
+            'is_favorited': self.get_is_favorited(recipe),
+            'is_in_shopping_cart': self.get_is_in_shopping_cart(recipe),
+            'name': recipe.name,
+            'image': image,
+            'images': image_variant_urls(recipe, request, image),
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        }
+
+    @cached_property
+    def author_serializer(self):
+        return CustomUserSerializer(context=self.context)
+
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         user = self.context.get('request').user
         return user.is_authenticated and user.favorite.filter(recipe=recipe).exists()
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         user = self.context.get('request').user
         return (user.is_authenticated and
                 user.shopping_cart.filter(recipe=recipe).exists()
         )
 
 
+class CookableRecipeSerializer(RecipeReadSerializer):
+    coverage = FloatField(read_only=True)
+    missing_count = IntegerField(read_only=True)
+
+    class Meta(RecipeReadSerializer.Meta):
+        fields = RecipeReadSerializer.Meta.fields + ('coverage', 'missing_count')
+
+    def to_representation(self, recipe):
+        representation = super().to_representation(recipe)
+        representation['coverage'] = float(recipe.coverage)
+        representation['missing_count'] = int(recipe.missing_count)
+        return representation
+
+
+class RecipeImageField(Base64ImageField):
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            return ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
+
+
 class RecipeSerializer(RecipeReadSerializer):
     tags = PrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True, required=True)
     ingredients = IngredientInRecipeSerializer(many=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     def validate_tags(self, tags):
         if not tags:
@@ -162,24 +261,68 @@ class RecipeSerializer(RecipeReadSerializer):
             raise ValidationError('Обязтельное поле')
         ingredients_list = []
         for item in ingredients:
-            ingredient = item['id']
+            try:
+                ingredient = int(item['id'])
+            except (TypeError, ValueError):
+                raise ValidationError('Некорректный идентификатор ингредиента')
             if ingredient in ingredients_list:
                 raise ValidationError('Ингридиенты не должны повторяться')
             if int(item['amount']) < 1:
                 raise ValidationError('Убедитесь, что это значение больше либо равно 1')
             ingredients_list.append(ingredient)
-        return ingredients
+        existing = Ingredient.objects.in_bulk(ingredients_list)
+        missing = [str(id) for id in ingredients_list if id not in existing]
+        if missing:
+            raise ValidationError(
+                'Ингредиенты не найдены: {}'.format(', '.join(missing))
+            )
+        return [
+            {'ingredient': existing[id], 'amount': item['amount']}
+            for id, item in zip(ingredients_list, ingredients)
+        ]
 
     @staticmethod
     def __set_ingredients(recipe, ingredients):
         IngredientInRecipe.objects.bulk_create(
             [IngredientInRecipe(
-                amount=ingredient.pop('amount'),
-                ingredient=Ingredient.objects.get(**ingredient),
+                amount=ingredient['amount'],
+                ingredient=ingredient['ingredient'],
                 recipe=recipe
             ) for ingredient in ingredients]
         )
 
+    @classmethod
+    def __update_ingredients(cls, recipe, ingredients):
+        amounts = {
+            ingredient['ingredient'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        removed = []
+        changed = []
+        for item in recipe.ingredients_in_recipe.all():
+            amount = amounts.pop(item.ingredient_id, None)
+            if amount is None:
+                removed.append(item.id)
+            elif item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if removed:
+            IngredientInRecipe.objects.filter(id__in=removed).delete()
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ['amount'])
+        cls.__set_ingredients(recipe, [
+            ingredient for ingredient in ingredients
+            if ingredient['ingredient'].id in amounts
+        ])
+        if removed or changed or amounts:
+            bump_shopping_cart_version(shopping_cart__recipe=recipe)
+        # Удалённые строки пересчитываются сигналом post_delete,
+        # bulk_update и bulk_create сигналов не отправляют.
+        if changed or amounts:
+            shopping_list.refresh_recipe(
+                recipe, [item.ingredient_id for item in changed] + list(amounts)
+            )
+
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
@@ -191,10 +334,27 @@ class RecipeSerializer(RecipeReadSerializer):
     def update(self, recipe, validated_data):
         ingredients = validated_data.pop('ingredients')
         recipe = super().update(recipe, validated_data)
-        recipe.ingredients.clear()
-        self.__set_ingredients(recipe, ingredients)
-        recipe.save()
+        self.__update_ingredients(recipe, ingredients)
         return recipe
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], 'tags', 'ingredients_in_recipe__ingredient'
+        )
         return RecipeReadSerializer(instance, context=self.context).data
+
+
+class IdListSerializer(Serializer):
+    ids = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ACTION_MAX_ITEMS
+    )
+
+
+class IngredientIdsSerializer(Serializer):
+    ingredients = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_ACTION_MAX_ITEMS
+    )
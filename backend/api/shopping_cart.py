@@ -0,0 +1,81 @@
+import csv
+import io
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+from recipes.models import ShoppingListItem
+
+
+def get_shopping_cart(user):
+    return list(
+        ShoppingListItem.objects.filter(user=user)
+        .values_list('ingredient__name', 'ingredient__measurement_unit', 'amount')
+        .order_by('ingredient__name')
+    )
+
+
+def get_shopping_list(user):
+    return [
+        {'id': id, 'name': name, 'measurement_unit': unit, 'amount': amount}
+        for id, name, unit, amount in ShoppingListItem.objects.filter(user=user)
+        .values_list(
+            'ingredient', 'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        )
+        .order_by('ingredient__name')
+    ]
+
+
+def export_txt(ingredients):
+    for ingredient in ingredients:
+        yield '{} ({}) - {}\n'.format(*ingredient)
+
+
+def export_csv(ingredients):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('Ингредиент', 'Единица измерения', 'Количество'))
+    for ingredient in ingredients:
+        writer.writerow(ingredient)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_pdf(ingredients):
+    if 'ShoppingCart' not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont('ShoppingCart', settings.SHOPPING_CART_FONT)
+        )
+    buffer = io.BytesIO()
+    document = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - 50
+    document.setFont('ShoppingCart', 16)
+    document.drawString(50, y, 'Список покупок')
+    document.setFont('ShoppingCart', 12)
+    for ingredient in ingredients:
+        y -= 20
+        if y < 50:
+            document.showPage()
+            document.setFont('ShoppingCart', 12)
+            y = height - 50
+        document.drawString(50, y, '{} ({}) - {}'.format(*ingredient))
+    document.save()
+    yield buffer.getvalue()
+
+
+async def aiterate(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', export_txt),
+    'csv': ('text/csv; charset=utf-8', export_csv),
+    'pdf': ('application/pdf', export_pdf),
+}
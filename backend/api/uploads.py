@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import ImageFile
+from rest_framework.exceptions import ValidationError
+
+
+class RecipeImageUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загружаемое изображение сразу на диск и прерывает загрузку,
+    как только файл превышает допустимый размер или разрешение.
+
+    Разрешение читается из заголовка: парсеру передаются только первые
+    RECIPE_IMAGE_HEADER_LIMIT байт, поскольку он хранит в памяти всё
+    полученное до декодирования заголовка.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.parser = ImageFile.Parser()
+        self.dimensions_checked = False
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise ValidationError({'image': ['Размер файла не должен превышать {} МБ'.format(
+                settings.RECIPE_IMAGE_MAX_SIZE // (1024 * 1024)
+            )]})
+        if not self.dimensions_checked:
+            self.check_dimensions(raw_data, start)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.dimensions_checked:
+            self.reject_not_image()
+        return super().file_complete(file_size)
+
+    def reject_not_image(self):
+        raise ValidationError({'image': ['Файл не является изображением']})
+
+    def check_dimensions(self, raw_data, start):
+        limit = settings.RECIPE_IMAGE_HEADER_LIMIT
+        try:
+            self.parser.feed(raw_data[:limit - start])
+        except Exception:
+            self.reject_not_image()
+        if self.parser.image is None:
+            if start + len(raw_data) >= limit:
+                self.reject_not_image()
+            return
+        self.dimensions_checked = True
+        size = self.parser.image.size
+        self.parser = None
+        if max(size) > settings.RECIPE_IMAGE_MAX_DIMENSION:
+            raise ValidationError({'image': ['Разрешение изображения не должно превышать {0}x{0}'.format(
+                settings.RECIPE_IMAGE_MAX_DIMENSION
+            )]})
@@ -1,7 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import UsersViewset, TagViewset, RecipeViewset, IngredientViewset
+from .views import (
+    UsersViewset, TagViewset, RecipeViewset, IngredientViewset, MetricsView
+)
 
 
 router = DefaultRouter()
@@ -11,6 +13,7 @@ router.register('recipes', RecipeViewset, basename='recipes')
 router.register('ingredients', IngredientViewset, basename='ingredients')
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken'))
 ]
@@ -1,90 +1,322 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.db.models import (
+    Count, Exists, ExpressionWrapper, F, FloatField, OuterRef, Prefetch, Q, Value,
+    Window
+)
+from django.db.models.functions import RowNumber
+from django.http import (
+    HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+)
+from django.utils.http import parse_etags, quote_etag
 from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 
+from recipes.feed import get_feed
 from recipes.models import (
     Tag, Ingredient, Recipe, IngredientInRecipe, FavoriteRecipes, ShoppingCart
 )
 from users.models import User, Subscribe
+from .autocomplete import ingredient_index
 from .filters import RecipeFilter, IngredientFilter
-from .mixins import CreateDeleteMixin
-from .pagination import Pagination
+from .metrics import registry
+from .mixins import CacheResponseMixin, ConditionalGetMixin, CreateDeleteMixin
+from .pagination import Pagination, RecipePagination, SubscriptionPagination
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (
     SubscriptionSerializer, TagSerializer, IngredientSerializer,
-    RecipeSerializer, RecipeMinifiedSerializer
+    RecipeSerializer, RecipeReadSerializer, RecipeMinifiedSerializer,
+    CookableRecipeSerializer, IngredientIdsSerializer
+)
+from .shopping_cart import (
+    EXPORT_FORMATS, aiterate, get_shopping_cart, get_shopping_list
 )
+from .uploads import RecipeImageUploadHandler
 
 
 class UsersViewset(UserViewSet, CreateDeleteMixin):
     pagination_class = Pagination
     lookup_field = 'pk'
 
-    @action(detail=False)
+    @action(detail=False, pagination_class=SubscriptionPagination)
     def subscriptions(self, request):
-        queryset = User.objects.filter(subscribed__user=request.user)
+        recipes = Recipe.objects.all()
+        recipes_limit = request.query_params.get(settings.LIMIT_QUERY_PARAM)
+        if recipes_limit:
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author'),
+                    order_by=F('pub_date').desc()
+                )
+            ).filter(row_number__lte=int(recipes_limit))
+        queryset = (
+            User.objects
+            .filter(subscribed__user=request.user)
+            .annotate(recipes_count=Count('recipes'), is_subscribed=Value(True))
+            .order_by('id')
+            .prefetch_related(
+                Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+            )
+        )
         page = self.paginate_queryset(queryset)
         serializer = SubscriptionSerializer(
             page, many=True, context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(['POST', 'DELETE'], detail=False, url_path='subscribe')
+    def subscribe_bulk(self, request):
+        return self.bulk_create_delete(
+            model=Subscribe, field='author',
+            queryset=User.objects.exclude(id=request.user.id)
+        )
+
     @action(['POST', 'DELETE'], detail=True)
     def subscribe(self, request, *args, **kwargs):
         return self.create_delete(
-            serializer=SubscriptionSerializer, model=Subscribe, field='author'
+            serializer=SubscriptionSerializer, model=Subscribe, field='author',
+            exists_error='Подписка уже оформлена',
+            missing_error='Подписка не оформлена'
         )
 
 
-class TagViewset(ReadOnlyModelViewSet):
+class TagViewset(CacheResponseMixin, ReadOnlyModelViewSet):
+    cache_prefix = 'tag'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
 
 
-class IngredientViewset(ReadOnlyModelViewSet):
+class IngredientViewset(CacheResponseMixin, ReadOnlyModelViewSet):
+    cache_prefix = 'ingredient'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('name') and settings.INGREDIENT_INDEX:
+            return self.cached_response(self.search, request)
+        return super().list(request, *args, **kwargs)
+
+    def search(self, request):
+        return Response(ingredient_index.search(request.query_params['name']))
+
 
-class RecipeViewset(ModelViewSet, CreateDeleteMixin):
+class RecipeViewset(ConditionalGetMixin, ModelViewSet, CreateDeleteMixin):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
-    pagination_class = Pagination
+    pagination_class = RecipePagination
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [RecipeImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Recipe.objects.prefetch_related(*self.get_prefetch_lookups())
+        if not user.is_authenticated:
+            return queryset.select_related('author').annotate(
+                is_favorited=Value(False), is_in_shopping_cart=Value(False),
+                is_author_subscribed=Value(False)
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                FavoriteRecipes.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_author_subscribed=Exists(
+                Subscribe.objects.filter(user=user, author=OuterRef('author'))
+            )
+        )
+
+    def get_prefetch_lookups(self):
+        user = self.request.user
+        lookups = ('tags', 'ingredients_in_recipe__ingredient')
+        if not user.is_authenticated:
+            return lookups
+        authors = User.objects.annotate(
+            is_subscribed=Exists(
+                Subscribe.objects.filter(user=user, author=OuterRef('pk'))
+            )
+        )
+        return lookups + (Prefetch('author', queryset=authors),)
+
+    def get_etag_fields(self, recipe):
+        # Ответ зависит и от флагов текущего пользователя, поэтому они
+        # входят в ETag вместе с датой изменения рецепта.
+        return (
+            recipe.id, recipe.updated_at.isoformat(), recipe.is_favorited,
+            recipe.is_in_shopping_cart, recipe.is_author_subscribed
+        )
+
+    def get_last_modified(self, recipe):
+        # Флаги пользователя не отражаются в updated_at, поэтому
+        # Last-Modified отдаётся только анонимным пользователям.
+        if not self.request.user.is_authenticated:
+            return recipe.updated_at
+        return None
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return RecipeReadSerializer
+        return super().get_serializer_class()
+
+    def get_recipes_in_order(self, ids):
+        recipes = self.get_queryset().in_bulk(ids)
+        return [recipes[id] for id in ids if id in recipes]
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(detail=False, permission_classes=(AllowAny,), pagination_class=Pagination)
+    def cookable(self, request):
+        serializer = IngredientIdsSerializer(
+            data={'ingredients': [
+                id for value in request.query_params.getlist('ingredients')
+                for id in value.split(',') if id
+            ]}
+        )
+        serializer.is_valid(raise_exception=True)
+        ingredients = set(serializer.validated_data['ingredients'])
+        # Рецепты с хотя бы одним из ингредиентов находятся по индексу
+        # (ingredient, recipe), покрытие считается одним GROUP BY.
+        ranking = (
+            IngredientInRecipe.objects
+            .filter(recipe__in=IngredientInRecipe.objects
+                    .filter(ingredient__in=ingredients).values('recipe'))
+            .values('recipe')
+            .annotate(
+                matched=Count('id', filter=Q(ingredient__in=ingredients)),
+                total=Count('id')
+            )
+            .annotate(coverage=ExpressionWrapper(
+                F('matched') * 1.0 / F('total'), output_field=FloatField()
+            ))
+            .order_by('-coverage', '-matched', '-recipe')
+        )
+        page = self.paginate_queryset(ranking)
+        rows = {row['recipe']: row for row in (ranking if page is None else page)}
+        recipes = self.get_recipes_in_order(rows)
+        for recipe in recipes:
+            row = rows[recipe.id]
+            recipe.coverage = row['coverage']
+            recipe.missing_count = row['total'] - row['matched']
+        serializer = CookableRecipeSerializer(
+            recipes, many=True, context=self.get_serializer_context()
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False, permission_classes=(IsAuthenticated,), pagination_class=Pagination
+    )
+    def feed(self, request):
+        entries = get_feed(request.user)
+        page = self.paginate_queryset(entries)
+        serializer = RecipeReadSerializer(
+            self.get_recipes_in_order(
+                [recipe for recipe, _ in (entries if page is None else page)]
+            ),
+            many=True, context=self.get_serializer_context()
+        )
+        if page is None:
+            return Response(serializer.data)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        ['POST', 'DELETE'], detail=False, url_path='favorite',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_bulk(self, request):
+        return self.bulk_create_delete(
+            model=FavoriteRecipes, field='recipe', queryset=Recipe.objects.all()
+        )
+
+    @action(
+        ['POST', 'DELETE'], detail=False, url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_bulk(self, request):
+        return self.bulk_create_delete(
+            model=ShoppingCart, field='recipe', queryset=Recipe.objects.all()
+        )
+
     @action(['POST', 'DELETE'], detail=True, permission_classes=(IsAuthenticated,))
     def favorite(self, request, *args, **kwargs):
         return self.create_delete(
-            serializer=RecipeMinifiedSerializer, model=FavoriteRecipes, field='recipe'
+            serializer=RecipeMinifiedSerializer, model=FavoriteRecipes, field='recipe',
+            exists_error='Рецепт уже есть в избранном',
+            missing_error='Рецепта нет в избранном'
         )
 
     @action(['POST', 'DELETE'], detail=True, permission_classes=(IsAuthenticated,))
     def shopping_cart(self, request, *args, **kwargs):
         return self.create_delete(
-            serializer=RecipeMinifiedSerializer, model=ShoppingCart, field='recipe'
+            serializer=RecipeMinifiedSerializer, model=ShoppingCart, field='recipe',
+            exists_error='Рецепт уже есть в корзине',
+            missing_error='Рецепта нет в корзине'
         )
 
-    @action(detail=False)
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def shopping_list(self, request):
+        user = request.user
+        etag = self.get_shopping_cart_etag(user, 'json')
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return HttpResponseNotModified(headers={'ETag': etag})
+        return Response(
+            get_shopping_list(user),
+            headers={'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        )
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
     def download_shopping_cart(self, request):
-        ingredients = (
-            IngredientInRecipe.objects
-            .filter(recipe__shopping_cart__user=request.user)
-            .values('ingredient')
-            .annotate(amount=Sum('amount'))
-            .values_list('ingredient__name', 'ingredient__measurement_unit', 'amount')
+        export_format = request.query_params.get('type', 'txt')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError(
+                {'type': 'Допустимые форматы: {}'.format(', '.join(EXPORT_FORMATS))}
+            )
+        user = request.user
+        etag = self.get_shopping_cart_etag(user, export_format)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return HttpResponseNotModified(headers={'ETag': etag})
+        content_type, export = EXPORT_FORMATS[export_format]
+        content = export(get_shopping_cart(user))
+        if settings.SERVER_MODE == 'asgi':
+            content = aiterate(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{export_format}"'
+        )
+        return response
+
+    def get_shopping_cart_etag(self, user, export_format):
+        # Пользователь может быть взят из кэша токенов, а версия списка
+        # покупок меняется через update() без сброса этого кэша.
+        user.refresh_from_db(fields=('shopping_cart_version',))
+        return quote_etag(f'{user.id}-{user.shopping_cart_version}-{export_format}')
+
+
+class MetricsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(
+            registry.export(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
         )
-        data = [('{} ({}) - {}'.format(*ingredient)) for ingredient in ingredients]
-        return HttpResponse('\n'.join(data), content_type='text/plain')
@@ -56,9 +56,9 @@ class RecipeAdmin(admin.ModelAdmin):
     filter_horizontal = ('tags',)
     inlines = (RecipeIngredientAdmin,)
 
-    @admin.display(description='Добавлен в избранное')
+    @admin.display(description='Добавлен в избранное', ordering='favorites_count')
     def recipe_in_favorites(self, recipe):
-        return recipe.favorite.count()
+        return recipe.favorites_count
 
     class Meta:
         verbose_name = 'Рецепты'
@@ -0,0 +1,95 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from users.models import Subscribe, User
+from .models import FeedEntry, Recipe
+
+# Лента подписок строится при записи: новый рецепт сразу раскладывается
+# по лентам подписчиков автора. Рецепты авторов, у которых подписчиков
+# больше FEED_FANOUT_LIMIT, в ленты не пишутся и подмешиваются при чтении.
+
+
+def fan_out(recipe):
+    if recipe.author_id is None:
+        return
+    followers_count = User.objects.values_list(
+        'followers_count', flat=True
+    ).get(id=recipe.author_id)
+    if followers_count > settings.FEED_FANOUT_LIMIT:
+        return
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user, recipe=recipe, pub_date=recipe.pub_date)
+         for user in Subscribe.objects.filter(
+             author=recipe.author_id
+         ).values_list('user', flat=True)],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+def backfill(subscriptions):
+    """Добавляет в ленты последние рецепты авторов новых подписок."""
+    subscribers = defaultdict(list)
+    for subscription in subscriptions:
+        subscribers[subscription.author_id].append(subscription.user_id)
+    recipes = (
+        Recipe.objects
+        .filter(
+            author__in=subscribers,
+            author__followers_count__lte=settings.FEED_FANOUT_LIMIT
+        )
+        .annotate(row_number=Window(
+            RowNumber(), partition_by=F('author'), order_by=F('pub_date').desc()
+        ))
+        .filter(row_number__lte=settings.FEED_BACKFILL_SIZE)
+        .values_list('id', 'author', 'pub_date')
+    )
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user, recipe_id=recipe, pub_date=pub_date)
+         for recipe, author, pub_date in recipes
+         for user in subscribers[author]],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+def authors_below_limit(author_ids, delta):
+    """Заполняет ленты подписчиков авторов, число подписчиков которых
+    уменьшилось на -delta и опустилось до FEED_FANOUT_LIMIT.
+
+    Пока подписчиков было больше, рецепты не раскладывались по лентам, а
+    подмешивались при чтении; теперь последние рецепты копируются в ленты,
+    как при новой подписке.
+    """
+    backfill(Subscribe.objects.filter(
+        author__in=User.objects.filter(
+            id__in=author_ids,
+            followers_count__gt=settings.FEED_FANOUT_LIMIT + delta,
+            followers_count__lte=settings.FEED_FANOUT_LIMIT
+        )
+    ).only('user', 'author'))
+
+
+def remove(subscription):
+    FeedEntry.objects.filter(
+        user=subscription.user_id, recipe__author=subscription.author_id
+    ).delete()
+
+
+def get_feed(user):
+    """Пары (id рецепта, дата публикации) ленты пользователя, новые первыми."""
+    entries = FeedEntry.objects.filter(user=user).values_list(
+        'recipe', 'pub_date'
+    ).order_by()
+    authors = Subscribe.objects.filter(
+        user=user, author__followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values('author')
+    if authors.exists():
+        entries = entries.union(
+            Recipe.objects.filter(author__in=authors)
+            .values_list('id', 'pub_date').order_by()
+        )
+    return entries.order_by('-pub_date', '-recipe')
@@ -0,0 +1,88 @@
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import Recipe
+
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='image-variants'
+)
+
+
+def variant_paths(image_name):
+    path = PurePosixPath(image_name)
+    return {
+        variant: str(path.parent / 'variants' / f'{path.stem}_{variant}.webp')
+        for variant in settings.IMAGE_VARIANTS
+    }
+
+
+def generate_image_variants(recipe_id, image_name):
+    try:
+        paths = variant_paths(image_name)
+        with default_storage.open(image_name) as file:
+            original = Image.open(file)
+            original.load()
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA')
+        for variant, size in settings.IMAGE_VARIANTS.items():
+            image = original.copy()
+            image.thumbnail(size)
+            buffer = io.BytesIO()
+            image.save(buffer, 'WEBP', quality=80)
+            default_storage.delete(paths[variant])
+            default_storage.save(paths[variant], ContentFile(buffer.getvalue()))
+        Recipe.objects.filter(id=recipe_id, image=image_name).update(
+            image_variants=paths, updated_at=timezone.now()
+        )
+        return True
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', image_name)
+        return False
+
+
+def generate_in_worker(recipe_id, image_name):
+    try:
+        return generate_image_variants(recipe_id, image_name)
+    finally:
+        close_old_connections()
+
+
+def delete_variants(paths):
+    for path in paths:
+        default_storage.delete(path)
+
+
+def schedule_image_variants(recipe):
+    if not recipe.image:
+        return
+    paths = variant_paths(recipe.image.name)
+    if recipe.image_variants == paths:
+        return
+    if recipe.image_variants:
+        # Изображение заменили: копии старого сбрасываются, чтобы до
+        # готовности новых API отдавал оригинал, а их файлы удаляются.
+        stale = set(recipe.image_variants.values()) - set(paths.values())
+        recipe.image_variants = {}
+        Recipe.objects.filter(id=recipe.id).update(image_variants={})
+        transaction.on_commit(lambda: delete_variants(stale))
+    recipe_id, image_name = recipe.id, recipe.image.name
+    if connection.vendor == 'sqlite':
+        # SQLite не допускает параллельной записи: UPDATE из пула потоков
+        # падал бы с database is locked, поэтому копии создаются сразу.
+        transaction.on_commit(lambda: generate_image_variants(recipe_id, image_name))
+        return
+    transaction.on_commit(
+        lambda: executor.submit(generate_in_worker, recipe_id, image_name)
+    )
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import generate_image_variants, variant_paths
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные изображения рецептов, для которых их ещё нет'
+
+    def handle(self, *args, **options):
+        generated = 0
+        for recipe in Recipe.objects.only('id', 'image', 'image_variants').iterator():
+            if recipe.image and recipe.image_variants != variant_paths(recipe.image.name):
+                generated += generate_image_variants(recipe.id, recipe.image.name)
+        self.stdout.write(f'Обработано рецептов: {generated}')
@@ -0,0 +1,171 @@
+import csv
+import io
+import json
+import re
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from import_export.signals import post_import
+
+from recipes.models import Ingredient, Tag
+
+# Поля в порядке столбцов CSV-файла.
+MODELS = {
+    'ingredient': (Ingredient, ('name', 'measurement_unit')),
+    'tag': (Tag, ('name', 'color', 'slug')),
+}
+
+JSON_CHUNK_SIZE = 64 * 1024
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def read_csv(file, fields):
+    for row in csv.reader(file):
+        if row:
+            yield dict(zip(fields, row))
+
+
+def read_json(file, fields):
+    """Читает JSON-массив объектов по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив объектов')
+    position = 1
+    while True:
+        position = JSON_SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield {field: item.get(field) for field in fields}
+
+
+READERS = {'.csv': read_csv, '.json': read_json}
+
+
+class Command(BaseCommand):
+    help = (
+        'Быстро загружает ингредиенты или тэги из CSV/JSON-файлов пакетами, '
+        'пропуская уже существующие записи'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', type=Path)
+        parser.add_argument(
+            '--model', choices=MODELS,
+            help='Модель для загрузки; по умолчанию определяется по имени файла'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--copy', action='store_true',
+            help='Загружать через COPY (только PostgreSQL)'
+        )
+
+    def handle(self, *args, **options):
+        if options['copy'] and connection.vendor != 'postgresql':
+            raise CommandError('--copy поддерживается только для PostgreSQL')
+        for path in options['paths']:
+            name = options['model'] or self.guess_model(path)
+            if path.suffix not in READERS:
+                raise CommandError(f'Неизвестный формат файла: {path}')
+            model, fields = MODELS[name]
+            start = time.perf_counter()
+            with open(path, encoding='utf-8') as file:
+                rows = self.clean(model, fields, READERS[path.suffix](file, fields))
+                load = self.copy if options['copy'] else self.bulk_create
+                read, inserted = load(model, fields, rows, options['batch_size'])
+            elapsed = time.perf_counter() - start
+            post_import.send(sender=self.__class__, model=model)
+            self.stdout.write(
+                f'{path}: прочитано {read}, добавлено {inserted}, '
+                f'пропущено {read - inserted} за {elapsed:.2f} с '
+                f'({read / elapsed if elapsed else 0:.0f} строк/с)'
+            )
+
+    def guess_model(self, path):
+        for name in MODELS:
+            if path.stem.startswith(name):
+                return name
+        raise CommandError(f'Не удалось определить модель для {path}, укажите --model')
+
+    def clean(self, model, fields, rows):
+        """Обрезает пробелы, отбрасывает некорректные строки и повторы."""
+        max_lengths = {field: model._meta.get_field(field).max_length for field in fields}
+        key = fields[:2] if model is Ingredient else fields[:1]
+        seen = set()
+        self.read = 0
+        for row in rows:
+            self.read += 1
+            row = {field: (row.get(field) or '').strip() or None for field in fields}
+            if not row['name'] or any(
+                value and len(value) > max_lengths[field]
+                for field, value in row.items()
+            ):
+                continue
+            identity = tuple(row[field] for field in key)
+            if identity in seen:
+                continue
+            seen.add(identity)
+            yield row
+
+    def batches(self, rows, batch_size):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def bulk_create(self, model, fields, rows, batch_size):
+        before = model.objects.count()
+        for batch in self.batches(rows, batch_size):
+            model.objects.bulk_create(
+                [model(**row) for row in batch], ignore_conflicts=True
+            )
+        return self.read, model.objects.count() - before
+
+    def copy(self, model, fields, rows, batch_size):
+        table = connection.ops.quote_name(model._meta.db_table)
+        columns = ', '.join(
+            connection.ops.quote_name(model._meta.get_field(field).column)
+            for field in fields
+        )
+        inserted = 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE load_data ON COMMIT DROP '
+                f'AS SELECT {columns} FROM {table} WITH NO DATA'
+            )
+            for batch in self.batches(rows, batch_size):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row in batch:
+                    writer.writerow(
+                        r'\N' if row[field] is None else row[field]
+                        for field in fields
+                    )
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY load_data ({columns}) FROM STDIN "
+                    f"WITH (FORMAT csv, NULL '\\N')",
+                    buffer
+                )
+                cursor.execute(
+                    f'INSERT INTO {table} ({columns}) '
+                    f'SELECT {columns} FROM load_data ON CONFLICT DO NOTHING'
+                )
+                inserted += cursor.rowcount
+                cursor.execute('TRUNCATE load_data')
+        return self.read, inserted
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import FavoriteRecipes, Recipe, ShoppingCart
+
+
+def count_related(model):
+    return Coalesce(
+        Subquery(
+            model.objects
+            .filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(count=Count('id'))
+            .values('count')
+        ),
+        0
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики избранного и списков покупок у рецептов, '
+        'если они разошлись с данными'
+    )
+
+    def handle(self, *args, **options):
+        favorites_count = count_related(FavoriteRecipes)
+        shopping_cart_count = count_related(ShoppingCart)
+        updated = (
+            Recipe.objects
+            .alias(
+                actual_favorites_count=favorites_count,
+                actual_shopping_cart_count=shopping_cart_count
+            )
+            .filter(
+                ~Q(favorites_count=F('actual_favorites_count'))
+                | ~Q(shopping_cart_count=F('actual_shopping_cart_count'))
+            )
+            .update(
+                favorites_count=favorites_count,
+                shopping_cart_count=shopping_cart_count
+            )
+        )
+        self.stdout.write(f'Исправлено рецептов: {updated}')
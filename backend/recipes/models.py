@@ -63,7 +63,8 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
         related_name='recipes',
         verbose_name='Автор рецепта',
-        null=True
+        null=True,
+        db_index=False
     )
     name = models.CharField(
         verbose_name='Название блюда',
@@ -85,6 +86,11 @@ class Recipe(models.Model):
         verbose_name='Изображение блюда',
         upload_to='recipes/'
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные изображения',
+        default=dict,
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Описание рецепта'
     )
@@ -99,6 +105,20 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['-pub_date']
@@ -110,23 +130,51 @@ class Recipe(models.Model):
                 name='unique_recipe'
             )
         ]
+        indexes = [
+            models.Index(fields=['pub_date', 'id'], name='recipe_pub_date_id_idx'),
+            models.Index(
+                fields=['author', '-pub_date'], name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date'],
+                name='recipe_favorites_count_idx'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Счётчики и уменьшенные изображения меняются только через update():
+        # полное сохранение (форма админки, RecipeSerializer.update) могло
+        # бы записать устаревшие значения, прочитанные вместе с рецептом.
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields') or [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+            ]
+            kwargs['update_fields'] = [
+                field for field in update_fields if field not in (
+                    'favorites_count', 'shopping_cart_count', 'image_variants'
+                )
+            ]
+        super().save(*args, **kwargs)
+
 
 class IngredientInRecipe(models.Model):
     recipe = models.ForeignKey(
         Recipe,
         on_delete=models.CASCADE,
         related_name='ingredients_in_recipe',
-        verbose_name='Рецепт'
+        verbose_name='Рецепт',
+        db_index=False
     )
     ingredient = models.ForeignKey(
         Ingredient,
         on_delete=models.CASCADE,
         related_name='ingredients_in_recipe',
-        verbose_name='Ингредиент'
+        verbose_name='Ингредиент',
+        db_index=False
     )
     amount = models.PositiveSmallIntegerField(
         verbose_name='Количество'
@@ -142,6 +190,11 @@ class IngredientInRecipe(models.Model):
                 name='unique_recipe_ingredient'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'], name='ingredient_recipe_idx'
+            )
+        ]
 
     def __str__(self):
         return f'{self.amount} {self.ingredient}'
@@ -152,7 +205,8 @@ class FavoriteRecipes(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='favorite',
-        verbose_name='В избранном у'
+        verbose_name='В избранном у',
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe,
@@ -181,7 +235,8 @@ class ShoppingCart(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='shopping_cart',
-        verbose_name='Пользователь'
+        verbose_name='Пользователь',
+        db_index=False
     )
     recipe = models.ForeignKey(
         Recipe,
@@ -203,3 +258,75 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил {self.recipe} в корзину'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Подписчик',
+        db_index=False
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+        db_index=False
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Ингредиент к покупке'
+        verbose_name_plural = 'Ингредиенты к покупке'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} ({self.amount}) для {self.user}'
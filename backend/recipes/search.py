@@ -0,0 +1,74 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Полнотекстовый индекс рецептов для SQLite: FTS5-таблица с внешним
+# содержимым и триггеры, которые держат её в актуальном состоянии.
+# Создаётся после migrate, так как SQLite теряет триггеры при пересоздании
+# таблицы в миграциях. Для PostgreSQL индекс создаёт миграция 0008.
+SQLITE_INDEX = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5('
+    "name, text, content='recipes_recipe', content_rowid='id')",
+    'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert '
+    'AFTER INSERT ON recipes_recipe BEGIN '
+    'INSERT INTO recipes_recipe_fts (rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete '
+    'AFTER DELETE ON recipes_recipe BEGIN '
+    'INSERT INTO recipes_recipe_fts (recipes_recipe_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    'CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update '
+    'AFTER UPDATE OF name, text ON recipes_recipe BEGIN '
+    'INSERT INTO recipes_recipe_fts (recipes_recipe_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); "
+    'INSERT INTO recipes_recipe_fts (rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    "INSERT INTO recipes_recipe_fts (recipes_recipe_fts) VALUES ('rebuild')",
+)
+
+
+def create_sqlite_index(using):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in SQLITE_INDEX:
+            cursor.execute(statement)
+
+
+def search_recipes(queryset, query):
+    """Отбирает рецепты по запросу и сортирует по релевантности."""
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        tsquery = "websearch_to_tsquery('russian', %s)"
+        match = RawSQL(
+            f'"recipes_recipe"."search_vector" @@ {tsquery}', (query,),
+            output_field=BooleanField()
+        )
+        rank = RawSQL(
+            f'ts_rank("recipes_recipe"."search_vector", {tsquery})', (query,),
+            output_field=FloatField()
+        )
+    elif vendor == 'sqlite':
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return queryset.none()
+        # Соединение с FTS-таблицей вместо коррелированного подзапроса:
+        # MATCH выполняется один раз, а не для каждой строки.
+        return queryset.extra(
+            select={'search_rank': '-bm25(recipes_recipe_fts, 10.0, 1.0)'},
+            tables=['recipes_recipe_fts'],
+            where=[
+                'recipes_recipe_fts.rowid = "recipes_recipe"."id"',
+                'recipes_recipe_fts MATCH %s',
+            ],
+            params=[' '.join(f'"{term}"*' for term in terms)]
+        ).order_by('-search_rank', '-pub_date', '-id')
+    else:
+        match = Q(name__icontains=query) | Q(text__icontains=query)
+        rank = Value(0.0)
+    return queryset.filter(match).annotate(
+        search_rank=rank
+    ).order_by('-search_rank', '-pub_date', '-id')
@@ -0,0 +1,62 @@
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Sum
+
+from .models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+
+# Список покупок хранится уже сложенным: строка (пользователь, ингредиент,
+# сумма). При изменении корзины или состава рецепта пересчитываются только
+# затронутые пары, поэтому чтение списка не зависит от размера корзины.
+
+
+def get_totals(users, ingredients):
+    return (
+        IngredientInRecipe.objects
+        .filter(ingredient__in=ingredients, recipe__shopping_cart__user__in=users)
+        .values('recipe__shopping_cart__user', 'ingredient')
+        .annotate(total=Sum('amount'))
+        .values_list('recipe__shopping_cart__user', 'ingredient', 'total')
+        .order_by()
+    )
+
+
+def refresh(users, ingredients):
+    """Пересчитывает строки списков покупок для пар пользователь-ингредиент.
+
+    users и ingredients - наборы id или подзапросы. Пересчёт всегда стоит
+    два запроса: удаление пар без рецептов в корзине и INSERT ... SELECT
+    с ON CONFLICT для остальных (PostgreSQL и SQLite).
+    """
+    stale = ShoppingListItem.objects.filter(
+        user__in=users, ingredient__in=ingredients
+    ).exclude(Exists(
+        IngredientInRecipe.objects.filter(
+            ingredient=OuterRef('ingredient'),
+            recipe__shopping_cart__user=OuterRef('user')
+        )
+    ))
+    sql, params = get_totals(users, ingredients).query.sql_with_params()
+    table = ShoppingListItem._meta.db_table
+    # Без точки сохранения: внутри запроса корзины она стоила бы ещё двух
+    # запросов, а ошибка здесь всё равно откатывает всю транзакцию.
+    with transaction.atomic(savepoint=False):
+        stale.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, ingredient_id, amount) {sql} '
+                f'ON CONFLICT (user_id, ingredient_id) '
+                f'DO UPDATE SET amount = excluded.amount',
+                params
+            )
+
+
+def refresh_carts(users, recipes):
+    """Рецепты recipes добавлены в корзины users или убраны из них."""
+    refresh(
+        users,
+        IngredientInRecipe.objects.filter(recipe__in=recipes).values('ingredient')
+    )
+
+
+def refresh_recipe(recipe, ingredients):
+    """У рецепта изменились количества или состав ингредиентов."""
+    refresh(ShoppingCart.objects.filter(recipe=recipe).values('user'), ingredients)
@@ -0,0 +1,156 @@
+from collections import Counter
+
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_migrate, post_save, pre_delete
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import Subscribe, User
+from . import feed, shopping_list
+from .images import schedule_image_variants
+from .models import (
+    FavoriteRecipes, Ingredient, IngredientInRecipe, Recipe, ShoppingCart, Tag
+)
+from .search import create_sqlite_index
+
+
+RECIPE_COUNTERS = {
+    FavoriteRecipes: 'favorites_count',
+    ShoppingCart: 'shopping_cart_count',
+}
+
+
+def update_recipe_counter(model, recipe_ids, delta):
+    counter = RECIPE_COUNTERS[model]
+    recipes = Recipe.objects.filter(id__in=recipe_ids)
+    if delta < 0:
+        recipes = recipes.filter(**{f'{counter}__gte': -delta})
+    recipes.update(**{counter: F(counter) + delta})
+
+
+def update_followers_count(author_ids, delta):
+    authors = User.objects.filter(id__in=author_ids)
+    if delta < 0:
+        authors = authors.filter(followers_count__gte=-delta)
+    authors.update(followers_count=F('followers_count') + delta)
+    if delta < 0:
+        feed.authors_below_limit(author_ids, delta)
+
+
+def touch_recipes(**filters):
+    Recipe.objects.filter(**filters).update(updated_at=timezone.now())
+
+
+def bump_shopping_cart_version(**filters):
+    User.objects.filter(**filters).update(
+        shopping_cart_version=F('shopping_cart_version') + 1
+    )
+
+
+def objects_bulk_created(model, objs):
+    if model in RECIPE_COUNTERS:
+        update_recipe_counter(model, [obj.recipe_id for obj in objs], 1)
+    if model is ShoppingCart and objs:
+        users = {obj.user_id for obj in objs}
+        bump_shopping_cart_version(id__in=users)
+        shopping_list.refresh_carts(users, {obj.recipe_id for obj in objs})
+    if model is Subscribe and objs:
+        followers = Counter(obj.author_id for obj in objs)
+        for delta in set(followers.values()):
+            update_followers_count(
+                [author for author, count in followers.items() if count == delta],
+                delta
+            )
+        feed.backfill(objs)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def shopping_cart_changed(instance, **kwargs):
+    bump_shopping_cart_version(id=instance.user_id)
+    shopping_list.refresh_carts([instance.user_id], [instance.recipe_id])
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def ingredients_in_recipe_changed(instance, **kwargs):
+    bump_shopping_cart_version(shopping_cart__recipe=instance.recipe_id)
+    shopping_list.refresh_recipe(instance.recipe_id, [instance.ingredient_id])
+    touch_recipes(id=instance.recipe_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_recipes(id=instance.id)
+    elif action in ('post_add', 'post_remove'):
+        touch_recipes(id__in=pk_set)
+    elif action == 'pre_clear':
+        touch_recipes(tags=instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(instance, created=False, **kwargs):
+    if not created:
+        touch_recipes(tags=instance)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(instance, created, **kwargs):
+    if not created:
+        touch_recipes(ingredients=instance)
+        # Название и единица измерения входят в список покупок и выгрузку.
+        bump_shopping_cart_version(shopping_list__ingredient=instance)
+
+
+# Поля автора, которые входят в ответ с рецептом.
+AUTHOR_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=User)
+def author_saved(instance, created, update_fields, **kwargs):
+    if not created and (update_fields is None or AUTHOR_FIELDS & update_fields):
+        touch_recipes(author=instance)
+
+
+@receiver(post_save, sender=FavoriteRecipes)
+@receiver(post_save, sender=ShoppingCart)
+def recipe_counter_increment(sender, instance, created, **kwargs):
+    if created:
+        update_recipe_counter(sender, [instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=FavoriteRecipes)
+@receiver(post_delete, sender=ShoppingCart)
+def recipe_counter_decrement(sender, instance, **kwargs):
+    update_recipe_counter(sender, [instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=Subscribe)
+def subscribed(instance, created, **kwargs):
+    if created:
+        update_followers_count([instance.author_id], 1)
+        feed.backfill([instance])
+
+
+@receiver(post_delete, sender=Subscribe)
+def unsubscribed(instance, **kwargs):
+    update_followers_count([instance.author_id], -1)
+    feed.remove(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, created, **kwargs):
+    schedule_image_variants(instance)
+    if created:
+        feed.fan_out(instance)
+
+
+@receiver(post_migrate)
+def recipes_migrated(sender, using, **kwargs):
+    if sender.name == 'recipes':
+        create_sqlite_index(using)
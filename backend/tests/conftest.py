@@ -0,0 +1,94 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from api.authentication import token_cache
+from api.management.commands.benchmark import Command
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def isolated_caches(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    cache.clear()
+    token_cache._entries.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(username):
+        return User.objects.create_user(
+            username=username, email=f'{username}@example.org',
+            password='password', first_name='Имя', last_name='Фамилия'
+        )
+    return make_user
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user('user')
+
+
+@pytest.fixture
+def author(make_user):
+    return make_user('author')
+
+
+@pytest.fixture
+def client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def author_client(author):
+    client = APIClient()
+    client.force_authenticate(author)
+    return client
+
+
+@pytest.fixture
+def anonymous_client():
+    return APIClient()
+
+
+@pytest.fixture
+def tag(db):
+    return Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+
+
+@pytest.fixture
+def ingredients(db):
+    return Ingredient.objects.bulk_create(
+        [Ingredient(name=f'ингредиент {i}', measurement_unit='г') for i in range(5)]
+    )
+
+
+@pytest.fixture
+def make_recipe(author, tag):
+    def make_recipe(name, amounts, recipe_author=None):
+        """amounts - словарь {ингредиент: количество}."""
+        recipe = Recipe.objects.create(
+            author=recipe_author or author, name=name, text='Описание',
+            cooking_time=10
+        )
+        recipe.tags.add(tag)
+        for ingredient, amount in amounts.items():
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            )
+        return recipe
+    return make_recipe
+
+
+@pytest.fixture
+def seeded(db, settings):
+    command = Command()
+    return command.seed({
+        'users': 60, 'recipes': 1000,
+        'ingredients': settings.BASE_DIR.parent / 'data' / 'ingredients.csv',
+    })
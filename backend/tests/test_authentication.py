@@ -0,0 +1,33 @@
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def token_client(user):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+    # Пользователь попадает в кэш токенов до изменения счётчиков.
+    assert client.get('/api/users/me/').status_code == 200
+    return client
+
+
+@pytest.mark.parametrize('method, url, data', (
+    ('patch', '/api/users/me/', {'first_name': 'Новое имя'}),
+    ('post', '/api/users/set_password/',
+     {'current_password': 'password', 'new_password': 'Nnew-password-123'}),
+))
+def test_cached_user_save_keeps_counters(
+    token_client, user, author_client, method, url, data
+):
+    author_client.post(f'/api/users/{user.id}/subscribe/')
+    User.objects.filter(id=user.id).update(shopping_cart_version=1)
+    response = getattr(token_client, method)(url, data, format='json')
+    assert response.status_code < 400, response.content
+    user.refresh_from_db()
+    assert user.followers_count == 1
+    assert user.shopping_cart_version == 1
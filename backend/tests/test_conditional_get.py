@@ -0,0 +1,85 @@
+import pytest
+from django.contrib.auth.models import update_last_login
+
+from recipes.models import Recipe
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipe(make_recipe, ingredients):
+    return make_recipe('Омлет', {ingredients[0]: 2})
+
+
+@pytest.mark.parametrize('url', ('/api/recipes/', '/api/recipes/{id}/'))
+def test_not_modified(client, recipe, url):
+    url = url.format(id=recipe.id)
+    response = client.get(url)
+    assert response.status_code == 200
+    not_modified = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert not_modified.status_code == 304
+    assert not_modified.content == b''
+    assert not_modified['ETag'] == response['ETag']
+
+
+@pytest.mark.parametrize('url', ('/api/recipes/', '/api/recipes/{id}/'))
+def test_user_flags_change_etag(client, recipe, url):
+    url = url.format(id=recipe.id)
+    etag = client.get(url)['ETag']
+    client.post(f'/api/recipes/{recipe.id}/favorite/')
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+
+def test_recipe_update_changes_etag(client, author_client, recipe):
+    url = f'/api/recipes/{recipe.id}/'
+    etag = client.get(url)['ETag']
+    author_client.patch(
+        url,
+        {'name': 'Новое название', 'tags': [recipe.tags.get().id],
+         'ingredients': [{'id': recipe.ingredients.get().id, 'amount': 2}]},
+        format='json'
+    )
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()['name'] == 'Новое название'
+
+
+def test_author_login_keeps_etag(client, author, recipe):
+    url = f'/api/recipes/{recipe.id}/'
+    etag = client.get(url)['ETag']
+    update_last_login(None, author)
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+def test_author_rename_changes_etag(client, author, recipe):
+    url = f'/api/recipes/{recipe.id}/'
+    etag = client.get(url)['ETag']
+    author.first_name = 'Другое'
+    author.save(update_fields=['first_name'])
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_anonymous_last_modified(anonymous_client, recipe):
+    url = f'/api/recipes/{recipe.id}/'
+    response = anonymous_client.get(url)
+    assert 'Last-Modified' in response
+    not_modified = anonymous_client.get(
+        url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+    )
+    assert not_modified.status_code == 304
+
+
+def test_authenticated_has_no_last_modified(client, recipe):
+    assert 'Last-Modified' not in client.get(f'/api/recipes/{recipe.id}/')
+
+
+def test_anonymous_cannot_edit_authorless_recipe(anonymous_client, recipe):
+    Recipe.objects.filter(id=recipe.id).update(author=None)
+    response = anonymous_client.patch(
+        f'/api/recipes/{recipe.id}/', {'name': 'Чужое'}, format='json'
+    )
+    assert response.status_code in (401, 403)
+    recipe.refresh_from_db()
+    assert recipe.name == 'Омлет'
@@ -0,0 +1,62 @@
+import pytest
+
+from api.mixins import insert_ignoring_conflicts
+from recipes.models import FavoriteRecipes, Recipe
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipes(make_recipe, ingredients):
+    return [make_recipe(f'Рецепт {i}', {ingredients[i]: 1}) for i in range(3)]
+
+
+def test_bulk_favorite_counts(client, recipes):
+    ids = [recipe.id for recipe in recipes]
+    client.post(f'/api/recipes/{ids[0]}/favorite/')
+    response = client.post('/api/recipes/favorite/', {'ids': ids}, format='json')
+    assert [item['status'] for item in response.json()['results']] == [
+        'exists', 'created', 'created'
+    ]
+    for recipe in recipes:
+        recipe.refresh_from_db()
+        assert recipe.favorites_count == 1
+
+
+def test_insert_ignoring_conflicts_returns_inserted(user, recipes):
+    FavoriteRecipes.objects.create(user=user, recipe=recipes[0])
+    inserted = insert_ignoring_conflicts(
+        FavoriteRecipes, 'recipe',
+        [FavoriteRecipes(user=user, recipe=recipe) for recipe in recipes]
+    )
+    assert [obj.recipe_id for obj in inserted] == [r.id for r in recipes[1:]]
+
+
+def test_insert_ignoring_conflicts_single_conflict(user, recipes):
+    FavoriteRecipes.objects.create(user=user, recipe=recipes[0])
+    assert insert_ignoring_conflicts(
+        FavoriteRecipes, 'recipe',
+        [FavoriteRecipes(user=user, recipe=recipes[0])]
+    ) == []
+
+
+def test_full_recipe_save_keeps_counters(client, recipes):
+    recipe = Recipe.objects.get(id=recipes[0].id)
+    client.post(f'/api/recipes/{recipe.id}/favorite/')
+    client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+    recipe.name = 'Новое название'
+    recipe.save()
+    recipe.refresh_from_db()
+    assert recipe.name == 'Новое название'
+    assert (recipe.favorites_count, recipe.shopping_cart_count) == (1, 1)
+
+
+@pytest.mark.parametrize('action', ('favorite', 'shopping_cart'))
+def test_repeated_add_is_rejected(client, recipes, action):
+    url = f'/api/recipes/{recipes[0].id}/{action}/'
+    assert client.post(url).status_code == 201
+    assert client.post(url).status_code == 400
+    recipes[0].refresh_from_db()
+    assert (recipes[0].favorites_count, recipes[0].shopping_cart_count) == (
+        (1, 0) if action == 'favorite' else (0, 1)
+    )
@@ -0,0 +1,79 @@
+import pytest
+
+from recipes.models import FeedEntry
+from users.models import Subscribe
+
+pytestmark = pytest.mark.django_db
+
+
+def feed_ids(client):
+    response = client.get('/api/recipes/feed/?limit=10')
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+def test_subscription_backfills_feed(client, author, make_recipe, ingredients):
+    old = make_recipe('Старый', {ingredients[0]: 1})
+    assert feed_ids(client) == []
+    assert client.post(f'/api/users/{author.id}/subscribe/').status_code == 201
+    assert feed_ids(client) == [old.id]
+
+
+def test_new_recipe_fanned_out(client, user, author, make_recipe, ingredients):
+    Subscribe.objects.create(user=user, author=author)
+    first = make_recipe('Первый', {ingredients[0]: 1})
+    second = make_recipe('Второй', {ingredients[1]: 1})
+    assert FeedEntry.objects.filter(user=user).count() == 2
+    assert feed_ids(client) == [second.id, first.id]
+
+
+def test_unsubscribe_removes_recipes(client, user, author, make_recipe, ingredients):
+    Subscribe.objects.create(user=user, author=author)
+    make_recipe('Рецепт', {ingredients[0]: 1})
+    assert client.delete(f'/api/users/{author.id}/subscribe/').status_code == 204
+    assert feed_ids(client) == []
+
+
+def test_feed_excludes_other_authors(client, user, author, make_user, make_recipe,
+                                     ingredients):
+    Subscribe.objects.create(user=user, author=author)
+    make_recipe('Чужой', {ingredients[0]: 1}, recipe_author=make_user('other'))
+    assert feed_ids(client) == []
+
+
+def test_popular_author_merged_on_read(settings, client, user, author, make_user,
+                                       make_recipe, ingredients):
+    settings.FEED_FANOUT_LIMIT = 1
+    Subscribe.objects.create(user=user, author=author)
+    Subscribe.objects.create(user=make_user('fan'), author=author)
+    recipe = make_recipe('Популярный', {ingredients[0]: 1})
+    assert not FeedEntry.objects.filter(recipe=recipe).exists()
+    assert feed_ids(client) == [recipe.id]
+
+
+def test_author_dropping_to_limit_keeps_recipes(settings, client, user, author,
+                                                make_user, make_recipe, ingredients):
+    settings.FEED_FANOUT_LIMIT = 1
+    fan = make_user('fan')
+    Subscribe.objects.create(user=user, author=author)
+    Subscribe.objects.create(user=fan, author=author)
+    recipe = make_recipe('Популярный', {ingredients[0]: 1})
+    Subscribe.objects.filter(user=fan).delete()
+    assert FeedEntry.objects.filter(user=user, recipe=recipe).exists()
+    assert feed_ids(client) == [recipe.id]
+
+
+def test_followers_count(client, author):
+    client.post(f'/api/users/{author.id}/subscribe/')
+    author.refresh_from_db()
+    assert author.followers_count == 1
+    client.post('/api/users/subscribe/', {'ids': [author.id]}, format='json')
+    author.refresh_from_db()
+    assert author.followers_count == 1
+    client.delete(f'/api/users/{author.id}/subscribe/')
+    author.refresh_from_db()
+    assert author.followers_count == 0
+
+
+def test_feed_requires_auth(anonymous_client):
+    assert anonymous_client.get('/api/recipes/feed/').status_code == 401
@@ -0,0 +1,46 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.management.commands.benchmark import ENDPOINTS, Command
+
+pytestmark = pytest.mark.django_db
+
+
+def test_endpoints_within_query_budget(seeded):
+    client = seeded.pop('client')
+    seeded.pop('user')
+    endpoints = [
+        (name, getattr(client, method), url.format(**seeded), budget)
+        for name, method, url, budget in ENDPOINTS
+    ]
+    # Первый проход прогревает кэш токенов и индекс ингредиентов, как
+    # первые итерации команды benchmark.
+    for name, request, url, budget in endpoints:
+        assert request(url).status_code < 400, name
+    exceeded = {}
+    for name, request, url, budget in endpoints:
+        with CaptureQueriesContext(connection) as captured:
+            response = request(url)
+        assert response.status_code < 400, (name, response.content[:200])
+        if len(captured) > budget:
+            exceeded[name] = (len(captured), budget)
+    assert not exceeded
+
+
+def test_get_endpoints_use_indexes(seeded):
+    client = seeded.pop('client')
+    seeded.pop('user')
+    statements = []
+    for name, method, url, budget in ENDPOINTS:
+        if method != 'get':
+            continue
+        with CaptureQueriesContext(connection) as captured:
+            assert client.get(url.format(**seeded)).status_code == 200, name
+        statements += [query['sql'] for query in captured]
+    if connection.vendor == 'postgresql':
+        # Таблицы тестовой базы занимают несколько страниц, и PostgreSQL
+        # просматривает их целиком; проверяется только, что индекс есть.
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+    assert not Command().has_sequential_scans(statements)
@@ -0,0 +1,30 @@
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from api.management.commands.benchmark import Command
+from api.renderers import FastJSONRenderer
+from api.serializers import IdListSerializer
+
+@pytest.mark.django_db
+def test_fast_serialization_matches_drf(seeded):
+    command = Command()
+    command.measure_serialization(seeded['user'], iterations=1)
+
+
+@pytest.mark.parametrize('data', (
+    {'ids': ['x', 0]},
+    {'ids': [1] * 1000},
+    {'ids': 'строка  '},
+))
+def test_fast_renderer_matches_json_renderer_on_errors(data):
+    serializer = IdListSerializer(data=data)
+    assert not serializer.is_valid()
+    assert (
+        FastJSONRenderer().render(serializer.errors)
+        == JSONRenderer().render(serializer.errors)
+    )
+
+
+def test_fast_renderer_falls_back_on_big_integers():
+    data = {'value': 2 ** 70}
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
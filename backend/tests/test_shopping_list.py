@@ -0,0 +1,125 @@
+import pytest
+from django.db.models import Sum
+
+from recipes.models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+
+pytestmark = pytest.mark.django_db
+
+
+def expected_totals(user):
+    return dict(
+        IngredientInRecipe.objects
+        .filter(recipe__shopping_cart__user=user)
+        .values('ingredient')
+        .annotate(total=Sum('amount'))
+        .values_list('ingredient', 'total')
+    )
+
+
+def stored_totals(user):
+    return dict(
+        ShoppingListItem.objects.filter(user=user)
+        .values_list('ingredient', 'amount')
+    )
+
+
+@pytest.fixture
+def recipes(make_recipe, ingredients):
+    first, second, third, *_ = ingredients
+    return (
+        make_recipe('Омлет', {first: 2, second: 100}),
+        make_recipe('Блины', {second: 200, third: 3}),
+    )
+
+
+def test_cart_add_and_remove(client, user, recipes, ingredients):
+    omelette, pancakes = recipes
+    client.post(f'/api/recipes/{omelette.id}/shopping_cart/')
+    client.post(f'/api/recipes/{pancakes.id}/shopping_cart/')
+    assert stored_totals(user) == {
+        ingredients[0].id: 2, ingredients[1].id: 300, ingredients[2].id: 3
+    }
+    client.delete(f'/api/recipes/{omelette.id}/shopping_cart/')
+    assert stored_totals(user) == {ingredients[1].id: 200, ingredients[2].id: 3}
+
+
+def test_bulk_cart(client, user, recipes):
+    ids = [recipe.id for recipe in recipes]
+    client.post('/api/recipes/shopping_cart/', {'ids': ids}, format='json')
+    assert stored_totals(user) == expected_totals(user)
+    client.delete('/api/recipes/shopping_cart/', {'ids': ids[:1]}, format='json')
+    assert stored_totals(user) == expected_totals(user)
+
+
+def test_recipe_update(client, author_client, user, recipes, ingredients):
+    omelette, _ = recipes
+    client.post(f'/api/recipes/{omelette.id}/shopping_cart/')
+    response = author_client.patch(
+        f'/api/recipes/{omelette.id}/',
+        {
+            'tags': [omelette.tags.get().id],
+            'ingredients': [
+                {'id': ingredients[1].id, 'amount': 150},
+                {'id': ingredients[3].id, 'amount': 7},
+            ],
+        },
+        format='json'
+    )
+    assert response.status_code == 200
+    assert stored_totals(user) == {ingredients[1].id: 150, ingredients[3].id: 7}
+
+
+def test_recipe_delete(client, author_client, user, recipes, ingredients):
+    omelette, pancakes = recipes
+    ShoppingCart.objects.create(user=user, recipe=omelette)
+    ShoppingCart.objects.create(user=user, recipe=pancakes)
+    assert author_client.delete(f'/api/recipes/{omelette.id}/').status_code == 204
+    assert stored_totals(user) == {ingredients[1].id: 200, ingredients[2].id: 3}
+
+
+def test_shopping_list_endpoint(client, user, recipes, ingredients):
+    for recipe in recipes:
+        client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+    response = client.get('/api/recipes/shopping_list/')
+    assert response.status_code == 200
+    assert response.json() == [
+        {'id': ingredient.id, 'name': ingredient.name,
+         'measurement_unit': 'г', 'amount': amount}
+        for ingredient, amount in zip(ingredients, (2, 300, 3))
+    ]
+    download = client.get('/api/recipes/download_shopping_cart/')
+    assert b''.join(download.streaming_content).decode() == ''.join(
+        f'{item["name"]} (г) - {item["amount"]}\n' for item in response.json()
+    )
+    not_modified = client.get(
+        '/api/recipes/shopping_list/', HTTP_IF_NONE_MATCH=response['ETag']
+    )
+    assert not_modified.status_code == 304
+    client.delete(f'/api/recipes/{recipes[0].id}/shopping_cart/')
+    changed = client.get(
+        '/api/recipes/shopping_list/', HTTP_IF_NONE_MATCH=response['ETag']
+    )
+    assert changed.status_code == 200
+
+
+def test_shopping_list_requires_auth(anonymous_client):
+    assert anonymous_client.get('/api/recipes/shopping_list/').status_code == 401
+
+
+def test_ingredient_rename_changes_etag(client, recipes, ingredients):
+    client.post(f'/api/recipes/{recipes[0].id}/shopping_cart/')
+    etags = [
+        client.get(url)['ETag'] for url in (
+            '/api/recipes/shopping_list/', '/api/recipes/download_shopping_cart/'
+        )
+    ]
+    ingredients[0].name = 'переименованный'
+    ingredients[0].save()
+    response = client.get('/api/recipes/shopping_list/', HTTP_IF_NONE_MATCH=etags[0])
+    assert response.status_code == 200
+    assert {item['id']: item['name'] for item in response.json()}[
+        ingredients[0].id
+    ] == 'переименованный'
+    assert client.get(
+        '/api/recipes/download_shopping_cart/', HTTP_IF_NONE_MATCH=etags[1]
+    ).status_code == 200
@@ -0,0 +1,47 @@
+import io
+
+import pytest
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.uploads import RecipeImageUploadHandler
+
+
+def jpeg(size, comment=b''):
+    buffer = io.BytesIO()
+    Image.new('RGB', size).save(buffer, 'JPEG', comment=comment)
+    return buffer.getvalue()
+
+
+def upload(data, chunk_size=1024):
+    handler = RecipeImageUploadHandler()
+    handler.new_file('image', 'image.jpg', 'image/jpeg', len(data))
+    for start in range(0, len(data), chunk_size):
+        handler.receive_data_chunk(data[start:start + chunk_size], start)
+    return handler.file_complete(len(data))
+
+
+def test_accepts_image():
+    assert upload(jpeg((100, 50))).size > 0
+
+
+def test_rejects_large_dimensions(settings):
+    settings.RECIPE_IMAGE_MAX_DIMENSION = 80
+    with pytest.raises(ValidationError, match='Разрешение'):
+        upload(jpeg((100, 50)))
+
+
+@pytest.mark.parametrize('data', (b'x' * 4096, b'', jpeg((100, 50))[:200]))
+def test_rejects_unknown_dimensions(data):
+    with pytest.raises(ValidationError, match='не является изображением'):
+        upload(data)
+
+
+def test_stops_parsing_after_header_limit(settings):
+    settings.RECIPE_IMAGE_HEADER_LIMIT = 2048
+    # Комментарий перед SOF отодвигает размеры за пределы заголовка.
+    data = jpeg((100, 50), comment=b'x' * 8000)
+    with pytest.raises(ValidationError, match='не является изображением'):
+        upload(data)
+    settings.RECIPE_IMAGE_HEADER_LIMIT = 16 * 1024
+    assert upload(data).size == len(data)
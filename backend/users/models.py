@@ -7,6 +7,16 @@ class User(AbstractUser):
     first_name = models.CharField(verbose_name='Имя', max_length=150)
     last_name = models.CharField(verbose_name='Фамилия', max_length=150)
     password = models.CharField(verbose_name='Пароль', max_length=150)
+    shopping_cart_version = models.PositiveIntegerField(
+        verbose_name='Версия списка покупок',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ['id']
@@ -16,13 +26,29 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        # Счётчики меняются только через update() в сигналах, а djoser
+        # сохраняет целиком пользователя из кэша токенов, которому может
+        # быть до TOKEN_CACHE_TTL секунд: такое сохранение их не пишет.
+        if not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields') or [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+            ]
+            kwargs['update_fields'] = [
+                field for field in update_fields
+                if field not in ('followers_count', 'shopping_cart_version')
+            ]
+        super().save(*args, **kwargs)
+
 
 class Subscribe(models.Model):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='subscriber',
-        verbose_name='Подписчик'
+        verbose_name='Подписчик',
+        db_index=False
     )
     author = models.ForeignKey(
         User,